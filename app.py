@@ -5,12 +5,14 @@ File: app.py
 
 import threading
 import time
+from datetime import datetime
 from flask import Flask, render_template, request, redirect, url_for, flash
 
 from config import Config
-from database.db import init_db, add_product, get_all_products, update_product_price, delete_product
-from services.price_scraper import fetch_price
-from services.email_service import send_price_alert
+from database.db import (init_db, add_product, get_all_products, get_products_for_check,
+                         update_products_prices, delete_product)
+from services.price_scraper import build_check_jobs, fetch_price, fetch_prices
+from services.email_service import send_price_alerts_batch
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -21,30 +23,38 @@ def check_prices_background():
         time.sleep(Config.CHECK_INTERVAL)
         print("\n🔄 Starting price check cycle...")
         
-        products = get_all_products()
+        products = get_products_for_check()
         
-        for product in products:
-            # Handle both old (8 columns) and new (9 columns) database formats
-            if len(product) == 9:
-                product_id, name, url, email, css_selector, old_price, _, use_selenium, _ = product
-            else:
-                product_id, name, url, email, css_selector, old_price, _, _ = product
-                use_selenium = False
+        jobs, details = build_check_jobs(products)
+        
+        updates = []
+        pending_alerts = []
+        for product_id, future, log in fetch_prices(jobs):
+            name, url, email, old_price, validators = details[product_id]
             
-            print(f"Checking: {name}")
-            new_price = fetch_price(url, css_selector, force_selenium=use_selenium)
+            print(f"Checked: {name}")
+            for line in log:
+                print(f"  {line.strip()}")
+            try:
+                new_price = future.result()
+            except Exception as e:
+                print(f"❌ Error fetching price for {name}: {e}")
+                continue
             
             if new_price:
-                update_product_price(product_id, new_price)
+                updates.append((new_price, datetime.now(), validators['etag'],
+                                validators['last_modified'], product_id))
                 
                 if old_price and old_price != new_price:
-                    send_price_alert(email, name, old_price, new_price, url)
+                    pending_alerts.append((email, name, old_price, new_price, url))
                     print(f"✓ Price changed for {name}: R{old_price} -> R{new_price}")
                 else:
                     print(f"✓ Price unchanged: R{new_price}")
             else:
                 print(f"❌ Could not fetch price for {name}")
         
+        update_products_prices(updates)
+        send_price_alerts_batch(pending_alerts)
         print("✓ Price check cycle complete\n")
 
 @app.route('/')
@@ -115,6 +125,8 @@ if __name__ == '__main__':
     print("\n🌐 Selenium Setup (for React apps):")
     print("  pip install selenium")
     print("  Then download ChromeDriver for your system")
+    print("  Or set JS_RENDERER=playwright after:")
+    print("  pip install playwright && playwright install chromium")
     print("="*60)
     
     app.run(debug=True, use_reloader=False)
\ No newline at end of file
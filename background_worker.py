@@ -8,9 +8,9 @@ File: background_worker.py
 import time
 import sys
 from datetime import datetime
-from database.db import init_db, get_all_products, update_product_price
-from services.price_scraper import fetch_price
-from services.email_service import send_price_alert
+from database.db import init_db, get_products_for_check, update_products_prices
+from services.price_scraper import build_check_jobs, fetch_prices
+from services.email_service import send_price_alerts_batch
 from config import Config
 
 def check_prices_cycle():
@@ -20,7 +20,7 @@ def check_prices_cycle():
     print(f"{'='*70}\n")
     
     try:
-        products = get_all_products()
+        products = get_products_for_check()
         
         if not products:
             print("⚠️  No products in database to check")
@@ -32,24 +32,28 @@ def check_prices_cycle():
         changed = 0
         errors = 0
         
-        for product in products:
-            # Handle both old (8 columns) and new (9 columns) database formats
-            if len(product) == 9:
-                product_id, name, url, email, css_selector, old_price, _, use_selenium, _ = product
-            else:
-                product_id, name, url, email, css_selector, old_price, _, _ = product
-                use_selenium = False
+        # Fetch concurrently; DB writes and emails stay on this thread
+        jobs, details = build_check_jobs(products)
+        
+        print(f"   Checking {len(jobs)} product(s) concurrently...\n")
+        
+        updates = []
+        pending_alerts = []
+        for product_id, future, log in fetch_prices(jobs):
+            name, url, email, old_price, validators = details[product_id]
             
             print(f"{'─'*70}")
             print(f"🏷️  {name}")
             print(f"   Current: R{old_price if old_price else 'N/A'}")
-            print(f"   Checking...")
+            for line in log:
+                print(f"   {line.strip()}")
             
             try:
-                new_price = fetch_price(url, css_selector, force_selenium=use_selenium)
+                new_price = future.result()
                 
                 if new_price:
-                    update_product_price(product_id, new_price)
+                    updates.append((new_price, datetime.now(), validators['etag'],
+                                    validators['last_modified'], product_id))
                     checked += 1
                     
                     if old_price and old_price != new_price:
@@ -60,11 +64,10 @@ def check_prices_cycle():
                         print(f"   Old: R{old_price:.2f}")
                         print(f"   New: R{new_price:.2f}")
                         print(f"   Change: R{change_amount:.2f} ({change_percent:+.1f}%)")
-                        print(f"   📧 Sending email to {email}...")
+                        print(f"   📧 Email to {email} queued")
                         
-                        send_price_alert(email, name, old_price, new_price, url)
+                        pending_alerts.append((email, name, old_price, new_price, url))
                         changed += 1
-                        print(f"   ✅ Email sent!")
                     else:
                         print(f"   ✓ Price unchanged: R{new_price:.2f}")
                 else:
@@ -75,6 +78,15 @@ def check_prices_cycle():
                 print(f"   ❌ Error: {e}")
                 errors += 1
         
+        # Save every new price in a single transaction
+        update_products_prices(updates)
+        
+        # Send all alerts over one SMTP connection
+        if pending_alerts:
+            print(f"\n📧 Sending {len(pending_alerts)} email alert(s)...")
+            sent = send_price_alerts_batch(pending_alerts)
+            print(f"   ✅ {sent} email(s) sent")
+        
         # Summary
         print(f"\n{'='*70}")
         print(f"📊 Cycle Summary:")
@@ -108,6 +120,8 @@ def run_worker():
     
     # Main loop
     cycle_count = 0
+    # Cycles start on a fixed schedule so their duration doesn't add drift
+    next_deadline = time.monotonic() + Config.CHECK_INTERVAL
     
     while True:
         try:
@@ -116,15 +130,24 @@ def run_worker():
             
             check_prices_cycle()
             
+            # Skip any slot the cycle overran instead of starting late
+            now = time.monotonic()
+            if now > next_deadline:
+                skipped = int((now - next_deadline) // Config.CHECK_INTERVAL) + 1
+                next_deadline += skipped * Config.CHECK_INTERVAL
+                print(f"⚠️  Cycle overran the check interval, skipping {skipped} slot(s)")
+            
             # Wait for next cycle
-            next_check = datetime.now().timestamp() + Config.CHECK_INTERVAL
+            sleep_seconds = next_deadline - now
+            next_check = datetime.now().timestamp() + sleep_seconds
             next_check_time = datetime.fromtimestamp(next_check).strftime('%Y-%m-%d %H:%M:%S')
             
-            print(f"⏰ Sleeping for {Config.CHECK_INTERVAL} seconds")
+            print(f"⏰ Sleeping for {sleep_seconds:.0f} seconds")
             print(f"⏰ Next check at: {next_check_time}")
             print(f"💤 Zzz...\n")
             
-            time.sleep(Config.CHECK_INTERVAL)
+            time.sleep(sleep_seconds)
+            next_deadline += Config.CHECK_INTERVAL
             
         except KeyboardInterrupt:
             print("\n\n👋 Worker stopped by user")
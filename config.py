@@ -7,10 +7,23 @@ class Config:
 
     SECRET_KEY = os.environ.get('SECRET_KEY')
 
-    DATABASE_PATH = '/data/price_tracker.db'
+    DATABASE_PATH = os.environ.get('DATABASE_PATH', '/data/price_tracker.db')
 
     GMAIL_USER = os.environ.get('GMAIL_USER')
     GMAIL_PASSWORD = os.environ.get('GMAIL_PASSWORD')
 
     # Price checking interval in seconds (3600 = 1 hour)
-    CHECK_INTERVAL = 14400  # 4 hours
\ No newline at end of file
+    CHECK_INTERVAL = 14400  # 4 hours
+
+    # Concurrent price fetches per cycle (Selenium gets its own, smaller pool
+    # because every headless Chrome costs ~200MB of RAM)
+    MAX_WORKERS = 8
+    SELENIUM_WORKERS = 2
+
+    # Browser used for JavaScript-rendered pages: 'selenium' or 'playwright'.
+    # Playwright needs `pip install playwright && playwright install chromium`;
+    # without it the scraper warns at startup and uses Selenium.
+    JS_RENDERER = os.environ.get('JS_RENDERER', 'selenium')
+
+    # Seconds a fetched price is reused before the page is scraped again
+    PRICE_CACHE_TTL = 60
\ No newline at end of file
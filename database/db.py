@@ -3,16 +3,56 @@ Enhanced Database Functions with Selenium support flag
 File: database/db.py
 """
 
+import os
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
-DATABASE_PATH = '/data/price_tracker.db'
+from config import Config
 
+DATABASE_PATH = Config.DATABASE_PATH
+
+# Columns returned by the product queries, in order
+_PRODUCT_COLUMNS = ("id, name, url, email, css_selector, current_price, last_checked, use_selenium, "
+                    "etag, last_modified")
+
+# One long-lived connection per thread (Flask request threads, worker pool)
+_local = threading.local()
+
+
+def _get_conn():
+    """Return this thread's connection, opening and tuning it on first use"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        # Autocommit mode; multi-statement writes use _transaction()
+        conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False, isolation_level=None)
+        # WAL lets readers run alongside the writer and needs fewer fsyncs
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000")
+        conn.row_factory = sqlite3.Row
+        _local.conn = conn
+    return conn
+
+@contextmanager
+def _transaction():
+    """Run the enclosed statements in a single transaction"""
+    conn = _get_conn()
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
 
 def init_db():
     """Initialize the database with the products table"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    c = conn.cursor()
+    os.makedirs(os.path.dirname(DATABASE_PATH) or '.', exist_ok=True)
+    c = _get_conn().cursor()
     
     # Check if table exists
     c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='products'")
@@ -29,51 +69,82 @@ def init_db():
                       current_price REAL,
                       last_checked TIMESTAMP,
                       use_selenium INTEGER DEFAULT 0,
-                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                      etag TEXT,
+                      last_modified TEXT)''')
     else:
-        # Add use_selenium column if it doesn't exist
-        try:
-            c.execute("ALTER TABLE products ADD COLUMN use_selenium INTEGER DEFAULT 0")
-            print("✓ Database upgraded: added use_selenium column")
-        except sqlite3.OperationalError:
-            # Column already exists
-            pass
+        # Add columns missing from older databases
+        for column, definition in [('use_selenium', 'INTEGER DEFAULT 0'),
+                                   ('etag', 'TEXT'),
+                                   ('last_modified', 'TEXT')]:
+            try:
+                c.execute(f"ALTER TABLE products ADD COLUMN {column} {definition}")
+                print(f"✓ Database upgraded: added {column} column")
+            except sqlite3.OperationalError:
+                # Column already exists
+                pass
     
-    conn.commit()
-    conn.close()
+    c.execute("CREATE INDEX IF NOT EXISTS idx_last_checked ON products(last_checked)")
 
 def add_product(name, url, email, css_selector, current_price, use_selenium=False):
     """Add a new product to track"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    c = conn.cursor()
+    c = _get_conn().cursor()
     c.execute("""INSERT INTO products (name, url, email, css_selector, current_price, last_checked, use_selenium)
                  VALUES (?, ?, ?, ?, ?, ?, ?)""",
               (name, url, email, css_selector, current_price, datetime.now(), 1 if use_selenium else 0))
-    conn.commit()
-    conn.close()
+
+def add_product_bulk(products):
+    """Add many products in one transaction
+    
+    Args:
+        products: Iterable of (name, url, email, css_selector, current_price, use_selenium)
+    """
+    now = datetime.now()
+    rows = [(name, url, email, css_selector, current_price, now, 1 if use_selenium else 0)
+            for name, url, email, css_selector, current_price, use_selenium in products]
+    with _transaction() as conn:
+        conn.executemany("""INSERT INTO products (name, url, email, css_selector, current_price, last_checked, use_selenium)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)""", rows)
 
 def get_all_products():
-    """Get all tracked products"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    c = conn.cursor()
-    c.execute("SELECT * FROM products ORDER BY created_at DESC")
-    products = c.fetchall()
-    conn.close()
-    return products
+    """Get all tracked products as rows addressable by column name"""
+    c = _get_conn().cursor()
+    c.execute(f"SELECT {_PRODUCT_COLUMNS} FROM products ORDER BY created_at DESC")
+    return c.fetchall()
+
+def get_products_for_check(limit=None):
+    """Get products to price-check, never-checked and stalest first
+    
+    SQLite sorts NULLs first under ASC, so the plain order uses idx_last_checked.
+    
+    Args:
+        limit: Optional maximum number of products to return
+    """
+    c = _get_conn().cursor()
+    c.execute(f"""SELECT {_PRODUCT_COLUMNS} FROM products
+                  ORDER BY last_checked ASC
+                  LIMIT ?""", (-1 if limit is None else limit,))
+    return c.fetchall()
 
 def update_product_price(product_id, new_price):
     """Update a product's price and last checked time"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    c = conn.cursor()
+    c = _get_conn().cursor()
     c.execute("UPDATE products SET current_price = ?, last_checked = ? WHERE id = ?",
              (new_price, datetime.now(), product_id))
-    conn.commit()
-    conn.close()
+
+def update_products_prices(rows):
+    """Update many products' prices and HTTP validators in one transaction
+    
+    Args:
+        rows: List of (new_price, last_checked, etag, last_modified, product_id) tuples
+    """
+    if not rows:
+        return
+    with _transaction() as conn:
+        conn.executemany("""UPDATE products SET current_price = ?, last_checked = ?, etag = ?, last_modified = ?
+                            WHERE id = ?""", rows)
 
 def delete_product(product_id):
     """Delete a product from tracking"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    c = conn.cursor()
+    c = _get_conn().cursor()
     c.execute("DELETE FROM products WHERE id = ?", (product_id,))
-    conn.commit()
-    conn.close()
\ No newline at end of file
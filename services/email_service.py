@@ -1,18 +1,14 @@
 
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email.message import EmailMessage
 from config import Config
 
-def send_price_alert(to_email, product_name, old_price, new_price, product_url=None):
-    """Send email notification about price change"""
+def _email_configured():
     gmail_user = Config.GMAIL_USER
-    gmail_password = Config.GMAIL_PASSWORD
-    
-    if not gmail_user or not gmail_password or gmail_user == 'your-email@gmail.com':
-        print(f"Email not configured. Would send: {product_name} price changed from R{old_price} to R{new_price}")
-        return
-    
+    return bool(gmail_user and Config.GMAIL_PASSWORD and gmail_user != 'your-email@gmail.com')
+
+def _build_alert_message(to_email, product_name, old_price, new_price, product_url=None):
+    """Build the price change email"""
     # Calculate price change
     price_diff = new_price - old_price
     percent_change = (price_diff / old_price * 100) if old_price > 0 else 0
@@ -50,18 +46,56 @@ Happy shopping!
 - Your Price Tracker
     """
     
+    msg = EmailMessage()
+    msg['From'] = Config.GMAIL_USER
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.set_content(body)
+    return msg
+
+def send_price_alert(to_email, product_name, old_price, new_price, product_url=None):
+    """Send email notification about price change"""
+    send_price_alerts_batch([(to_email, product_name, old_price, new_price, product_url)])
+
+def send_price_alerts_batch(alerts):
+    """
+    Send several price alerts over one SMTP session
+    
+    Args:
+        alerts: List of (to_email, product_name, old_price, new_price, product_url) tuples
+    
+    Returns:
+        int: Number of emails sent
+    """
+    if not alerts:
+        return 0
+    
+    if not _email_configured():
+        for _, product_name, old_price, new_price, _ in alerts:
+            print(f"Email not configured. Would send: {product_name} price changed from R{old_price} to R{new_price}")
+        return 0
+    
+    sent = 0
     try:
-        msg = MIMEMultipart()
-        msg['From'] = gmail_user
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
-        
         server = smtplib.SMTP('smtp.gmail.com', 587)
         server.starttls()
-        server.login(gmail_user, gmail_password)
-        server.send_message(msg)
-        server.quit()
-        print(f"✓ Email sent to {to_email}")
+        server.login(Config.GMAIL_USER, Config.GMAIL_PASSWORD)
     except Exception as e:
-        print(f"✗ Failed to send email: {e}")
\ No newline at end of file
+        print(f"✗ Failed to send email: {e}")
+        return 0
+    
+    try:
+        for alert in alerts:
+            to_email = alert[0]
+            try:
+                server.send_message(_build_alert_message(*alert))
+                sent += 1
+                print(f"✓ Email sent to {to_email}")
+            except Exception as e:
+                print(f"✗ Failed to send email to {to_email}: {e}")
+    finally:
+        try:
+            server.quit()
+        except Exception:
+            pass
+    return sent
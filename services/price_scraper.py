@@ -1,185 +1,675 @@
 """
-Enhanced Price Scraper with Selenium Support for React/SPA apps
+Enhanced Price Scraper with Selenium (or Playwright) Support for React/SPA apps
 File: services/price_scraper.py
 """
 
+import asyncio
+import contextvars
+import io
+import os
+import queue
 import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
 import requests
 from bs4 import BeautifulSoup
+from cachetools import TTLCache
+from cssselect import SelectorError
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from soupsieve import SelectorSyntaxError
+from urllib3.util.retry import Retry
+
+from config import Config
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Shared session so repeat hits to the same shop reuse keep-alive connections
+_SESSION = requests.Session()
+_SESSION.headers.update({
+    'User-Agent': USER_AGENT,
+    'Accept-Language': 'en-ZA,en;q=0.9',
+})
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32,
+                       max_retries=Retry(total=2, backoff_factor=0.3))
+_SESSION.mount('https://', _adapter)
+_SESSION.mount('http://', _adapter)
+
+# Messages for the product being fetched. fetch_prices() sets it per job so
+# pool threads don't interleave output; the check loop prints it with the result.
+_JOB_LOG = contextvars.ContextVar('job_log', default=None)
+
+def _log(message):
+    """Print now, or keep the message for the current fetch_prices() job"""
+    lines = _JOB_LOG.get()
+    if lines is None:
+        print(message)
+    else:
+        lines.append(message)
+
+def _run_logged(lines, fn, *args, **kwargs):
+    token = _JOB_LOG.set(lines)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _JOB_LOG.reset(token)
+
+_PLAYWRIGHT_INSTALL = "pip install playwright && playwright install chromium"
+
+def _resolve_js_renderer(renderer):
+    """Check the configured browser backend once at startup, else use Selenium"""
+    renderer = (renderer or 'selenium').lower()
+    if renderer == 'selenium':
+        return renderer
+    if renderer != 'playwright':
+        print(f"⚠️  Unknown JS_RENDERER {renderer!r}, using selenium")
+        return 'selenium'
+    
+    # Both the package and its downloaded Chromium are needed
+    try:
+        from playwright.sync_api import sync_playwright
+        
+        with sync_playwright() as p:
+            chromium_path = p.chromium.executable_path
+    except Exception as e:
+        print(f"⚠️  Playwright unavailable ({e}), using selenium. Install with: {_PLAYWRIGHT_INSTALL}")
+        return 'selenium'
+    if not os.path.exists(chromium_path):
+        print(f"⚠️  Playwright's Chromium is not installed, using selenium. Install with: {_PLAYWRIGHT_INSTALL}")
+        return 'selenium'
+    return renderer
+
+JS_RENDERER = _resolve_js_renderer(Config.JS_RENDERER)
+
+# Recently found prices keyed on (url, css_selector); TTLCache isn't thread-safe
+_PRICE_CACHE = TTLCache(maxsize=512, ttl=Config.PRICE_CACHE_TTL)
+_PRICE_CACHE_LOCK = threading.Lock()
+
+# Compiled once at import since they run on every checked page
+_PRICE_CLASS = re.compile(r'price', re.I)
+
+# Common price patterns to search for
+_PRICE_PATTERNS = [
+    {'class': _PRICE_CLASS},
+    {'id': re.compile(r'price', re.I)},
+    {'itemprop': 'price'},
+    {'class': re.compile(r'cost', re.I)},
+    {'class': re.compile(r'amount', re.I)},
+    {'data-price': True},
+    {'class': re.compile(r'product-price', re.I)},
+]
+
+# Currency symbols followed by numbers, anywhere in the page
+_PRICE_REGEX = re.compile(r'[R$]\s*\d+(?:[,\s]\d{3})*(?:\.\d{2})?')
+_REGEX_WINDOW = 200_000  # characters of page body scanned by _PRICE_REGEX
+
+# Elements a browser waits for before reading the page, when no selector is set
+_PRICE_ELEMENT_SELECTOR = '[class*=price], [data-price], [itemprop=price]'
+
+# One pass over a price's text: optional R/$ prefix, thousands groups
+# separated by commas or spaces, optional cents
+_PRICE_PARSE = re.compile(r'(?P<symbol>[$R]\s*)?(?P<whole>\d{1,3}(?:[,\s]\d{3})+|\d+)(?:\.(?P<cents>\d{2}))?')
+# Checked at the end of a match without consuming the next price's symbol
+_SYMBOL_AFTER = re.compile(r'\s*[$R]')
+_THOUSANDS_SEPARATOR = re.compile(r'[,\s]')
 
 def extract_price(html, css_selector=None):
     """Extract price from HTML content"""
-    soup = BeautifulSoup(html, 'html.parser')
+    soup = None
     
-    # If user provided a CSS selector, try that first
+    # If user provided a CSS selector, try that first (lxml runs it in C
+    # without building a BeautifulSoup tree)
     if css_selector:
-        elements = soup.select(css_selector)
-        for element in elements:
-            price_text = element.get_text()
-            price = parse_price(price_text)
-            if price:
-                print(f"  Found with CSS selector: {price_text.strip()[:50]} → R{price}")
-                return price
+        # Bytes, since lxml rejects str input with an XML encoding declaration
+        root = etree.HTML(html.encode('utf-8'), etree.HTMLParser(encoding='utf-8'))
+        try:
+            elements = root.cssselect(css_selector, translator='html') if root is not None else []
+        except SelectorError:
+            elements = []
+        price = _first_price_in((''.join(element.itertext()) for element in elements), 'CSS selector')
+        if price:
+            return price
+        
+        # cssselect supports less than soupsieve, which saved selectors were
+        # written against, so retry them there before moving on
+        soup = BeautifulSoup(html, 'lxml')
+        try:
+            elements = soup.select(css_selector)
+        except SelectorSyntaxError as e:
+            _log(f"  Invalid CSS selector {css_selector!r}: {str(e).splitlines()[0]}")
+            elements = []
+        price = _first_price_in((element.get_text() for element in elements), 'CSS selector')
+        if price:
+            return price
+    
+    # Stream the page and stop at the first price element, usually without
+    # building the whole tree
+    price = _stream_extract_price(html)
+    if price:
+        return price
     
-    # Common price patterns to search for
-    price_patterns = [
-        {'class': re.compile(r'price', re.I)},
-        {'id': re.compile(r'price', re.I)},
-        {'itemprop': 'price'},
-        {'class': re.compile(r'cost', re.I)},
-        {'class': re.compile(r'amount', re.I)},
-        {'data-price': True},
-        {'class': re.compile(r'product-price', re.I)},
-    ]
-    
-    for pattern in price_patterns:
+    if soup is None:
+        soup = BeautifulSoup(html, 'lxml')
+    
+    for pattern in _PRICE_PATTERNS:
         elements = soup.find_all(attrs=pattern)
         for element in elements:
             price_text = element.get_text()
             price = parse_price(price_text)
             if price:
-                print(f"  Found with pattern {pattern}: {price_text.strip()[:50]} → R{price}")
+                _log(f"  Found with pattern {pattern}: {price_text.strip()[:50]} → R{price}")
                 return price
     
-    # Try to find any price-like pattern in the entire page
-    # Look for currency symbols followed by numbers
-    price_regex = r'[R$]\s*\d+(?:[,\s]\d{3})*(?:\.\d{2})?'
-    matches = re.findall(price_regex, html)
-    if matches:
-        # Try each match and return the first valid price
-        for match in matches:
-            price = parse_price(match)
-            if price:
-                print(f"  Found with regex: {match} → R{price}")
-                return price
+    # Try to find any price-like pattern in the page body
+    # Look for currency symbols followed by numbers, capped to a window so
+    # script-heavy SPA pages don't get scanned end to end
+    start = max(html.find('<body'), 0)
+    for match in _PRICE_REGEX.finditer(html, start, start + _REGEX_WINDOW):
+        # Return the first valid price
+        price = parse_price(match.group(0))
+        if price:
+            _log(f"  Found with regex: {match.group(0)} → R{price}")
+            return price
     
     return None
 
+def _first_price_in(texts, source):
+    """Return the first text that parses as a price"""
+    for price_text in texts:
+        price = parse_price(price_text)
+        if price:
+            _log(f"  Found with {source}: {price_text.strip()[:50]} → R{price}")
+            return price
+    return None
+
+def _is_price_element(elem):
+    """Strongest price signals only; id, data-price, cost and amount are left
+    to the ordered pattern search so they can't win by coming first"""
+    return bool(_PRICE_CLASS.search(elem.get('class', ''))
+                or elem.get('itemprop') == 'price')
+
+def _stream_extract_price(html):
+    """Find a price in one streaming pass, discarding elements once scanned"""
+    # An empty page is an ordinary miss, not a parse failure
+    if not html or html.isspace():
+        return None
+    
+    context = etree.iterparse(io.BytesIO(html.encode('utf-8')), events=('start', 'end'),
+                              html=True, encoding='utf-8')
+    # Price elements still open; their children must keep their text
+    open_candidates = 0
+    try:
+        for event, elem in context:
+            if event == 'start':
+                if _is_price_element(elem):
+                    open_candidates += 1
+                continue
+            
+            if _is_price_element(elem):
+                open_candidates -= 1
+                price_text = ''.join(elem.itertext())
+                price = parse_price(price_text)
+                if price:
+                    _log(f"  Found while streaming: {price_text.strip()[:50]} → R{price}")
+                    return price
+            
+            if not open_candidates:
+                # Free what has been scanned so memory stays flat. The root
+                # can have siblings (comments, PIs) but no parent to trim.
+                elem.clear()
+                parent = elem.getparent()
+                while parent is not None and elem.getprevious() is not None:
+                    del parent[0]
+    except Exception as e:
+        # Only a shortcut; extract_price's full parse still runs on a miss
+        _log(f"  Streaming parse failed: {e}")
+    return None
+
 def parse_price(text):
     """Extract numeric price from text (handles R and $ symbols and formatting)"""
-    text = text.strip()
-    
-    # Try to find price with currency symbol first (more accurate)
-    # Match R or $ followed by numbers
-    currency_patterns = [
-        r'[$R]\s*(\d+(?:[,\s]\d{3})*(?:\.\d{2})?)',  # $495 or R495 or $ 495
-        r'(\d+(?:[,\s]\d{3})*(?:\.\d{2})?)\s*[$R]',  # 495$ or 495R
-    ]
-    
-    for pattern in currency_patterns:
-        match = re.search(pattern, text)
-        if match:
-            price_str = match.group(1).replace(',', '').replace(' ', '')
-            try:
-                price = float(price_str)
-                # Sanity check: price should be reasonable (between 0.01 and 1,000,000)
-                if 0.01 < price < 1000000:
-                    return price
-            except ValueError:
-                continue
+    # Best candidates first: R495, then 495R, then a bare number
+    symbol_after = None
+    bare_number = None
     
-    # Fallback: find any numbers in the text
-    # But only if they look like prices (2+ digits or have decimals)
-    all_numbers = re.findall(r'\d+(?:\.\d{2})?', text)
-    for num_str in all_numbers:
-        try:
-            price = float(num_str)
-            # Only accept if it looks like a real price
-            if price >= 10:  # Minimum price threshold
+    for match in _PRICE_PARSE.finditer(text):
+        # Separators are stripped, so int() can't fail. Dividing whole cents
+        # once rounds exactly like float("1.14"), which stored prices used.
+        whole = int(_THOUSANDS_SEPARATOR.sub('', match.group('whole')))
+        cents = match.group('cents')
+        price = (whole * 100 + int(cents)) / 100 if cents else float(whole)
+        
+        # Sanity check: price should be reasonable (between 0.01 and 1,000,000)
+        reasonable = 0.01 < price < 1000000
+        if match.group('symbol'):
+            if reasonable:
                 return price
-        except ValueError:
-            continue
+        elif _SYMBOL_AFTER.match(text, match.end()):
+            if reasonable and symbol_after is None:
+                symbol_after = price
+        elif price >= 10 and bare_number is None:
+            # Only accept bare numbers that look like a real price
+            bare_number = price
     
-    return None
+    return symbol_after if symbol_after is not None else bare_number
 
-def fetch_price_simple(url, css_selector=None):
-    """Fetch price using simple requests (fast, but won't work for React/SPA)"""
+def fetch_price_simple(url, css_selector=None, validators=None):
+    """
+    Fetch price using simple requests (fast, but won't work for React/SPA)
+    
+    Args:
+        url: Product URL
+        css_selector: Optional CSS selector
+        validators: Optional dict with the product's stored 'etag',
+            'last_modified' and 'price'. They are sent as a conditional GET
+            and the stored price is returned on 304 Not Modified. Updated in
+            place with the new response's ETag/Last-Modified.
+    """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept-Language': 'en-ZA,en;q=0.9',
-        }
-        response = requests.get(url, headers=headers, timeout=10)
+        headers = {}
+        if validators and validators.get('price'):
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+        
+        response = _SESSION.get(url, headers=headers, timeout=10)
+        if response.status_code == 304:
+            _log("  Page not modified, keeping stored price")
+            return validators['price']
         response.raise_for_status()
-        return extract_price(response.text, css_selector)
+        price = extract_price(response.text, css_selector)
+        
+        if validators is not None:
+            # Only trust the validators when this HTML actually held the price
+            found = price is not None
+            validators['etag'] = response.headers.get('ETag') if found else None
+            validators['last_modified'] = response.headers.get('Last-Modified') if found else None
+        return price
     except Exception as e:
-        print(f"Error fetching with requests: {e}")
+        _log(f"Error fetching with requests: {e}")
         return None
 
-def fetch_price_selenium(url, css_selector=None):
+def _chrome_options():
+    """Build the headless Chrome options used by every Selenium driver"""
+    from selenium.webdriver.chrome.options import Options
+    
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument(f"user-agent={USER_AGENT}")
+    
+    # Prices are in the DOM, so skip images and stylesheets entirely
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.stylesheets": 2,
+    })
+    # Return from driver.get() at DOMContentLoaded; the WebDriverWait for the
+    # price element covers anything rendered later
+    chrome_options.page_load_strategy = 'eager'
+    return chrome_options
+
+class SeleniumPool:
+    """
+    Reusable headless Chrome drivers
+    
+    Starting Chrome costs a few seconds and ~200MB, far more than loading a
+    page, so drivers are started lazily (up to `size`) and lent out per URL.
+    Use as a context manager so every driver is quit afterwards.
+    """
+    
+    def __init__(self, size=1):
+        self.size = size
+        # LIFO so a warm driver is reused before another Chrome is started
+        self._idle = queue.LifoQueue()
+        self._drivers = []
+        self._lock = threading.Lock()
+        for _ in range(size):
+            self._idle.put(None)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    @contextmanager
+    def driver(self):
+        """Borrow a driver, returning it to the pool when done"""
+        driver = self._acquire()
+        try:
+            yield driver
+        except Exception:
+            # The browser may be in a bad state, don't hand it out again
+            self._discard(driver)
+            raise
+        else:
+            try:
+                driver.delete_all_cookies()
+                self._idle.put(driver)
+            except Exception:
+                self._discard(driver)
+    
+    def close(self):
+        """Quit every driver started by this pool"""
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+    
+    def _acquire(self):
+        # None marks a free slot; a driver is only started when one is needed
+        driver = self._idle.get()
+        if driver is None:
+            try:
+                from selenium import webdriver
+                driver = webdriver.Chrome(options=_chrome_options())
+            except Exception:
+                self._idle.put(None)
+                raise
+            with self._lock:
+                self._drivers.append(driver)
+        return driver
+    
+    def _discard(self, driver):
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        self._idle.put(None)
+
+def fetch_price_selenium(url, css_selector=None, pool=None):
     """Fetch price from JavaScript-rendered pages using Selenium (works for React/SPA)"""
+    if pool is None:
+        with SeleniumPool() as pool:
+            return fetch_price_selenium(url, css_selector, pool)
+    
     try:
-        from selenium import webdriver
-        from selenium.webdriver.chrome.options import Options
-        from selenium.webdriver.chrome.service import Service
+        from selenium.common.exceptions import TimeoutException
         from selenium.webdriver.common.by import By
         from selenium.webdriver.support.ui import WebDriverWait
         from selenium.webdriver.support import expected_conditions as EC
         
-        # Setup headless Chrome
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-        
-        driver = webdriver.Chrome(options=chrome_options)
-        driver.get(url)
+        with pool.driver() as driver:
+            driver.get(url)
+            
+            # Return as soon as the price element renders (often well under 3s)
+            try:
+                WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, css_selector or _PRICE_ELEMENT_SELECTOR))
+                )
+            except TimeoutException:
+                _log("  Price element did not appear, parsing page as-is")
+            
+            html = driver.page_source
         
-        # Wait for page to load (wait for body to be present)
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
+        return extract_price(html, css_selector)
+    except ImportError:
+        _log("❌ Selenium not installed. Install with: pip install selenium")
+        return None
+    except Exception as e:
+        _log(f"❌ Selenium error: {e}")
+        return None
+
+# Caps Playwright browsers open at once (the batch browser plus any started
+# by simple-fetch fallbacks), matching SeleniumPool's limit for Chrome
+_PLAYWRIGHT_BROWSERS = threading.BoundedSemaphore(Config.SELENIUM_WORKERS)
+
+# Resource types that never contain the price
+_BLOCKED_RESOURCES = {'image', 'stylesheet', 'font', 'media'}
+
+async def _block_heavy_resources(route):
+    if route.request.resource_type in _BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def fetch_price_playwright(url, css_selector=None, browser=None):
+    """
+    Fetch price from JavaScript-rendered pages using Playwright
+    
+    Waits for the price element instead of sleeping. Pass a launched
+    browser to share it between pages; each page gets its own context.
+    """
+    try:
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError
         
-        # Additional wait for dynamic content to load
-        import time
-        time.sleep(3)  # Wait 3 seconds for JavaScript to render
+        if browser is None:
+            from playwright.async_api import async_playwright
+            
+            async with async_playwright() as p:
+                browser = await p.chromium.launch()
+                try:
+                    return await fetch_price_playwright(url, css_selector, browser)
+                finally:
+                    await browser.close()
         
-        html = driver.page_source
-        driver.quit()
+        context = await browser.new_context(user_agent=USER_AGENT)
+        try:
+            await context.route('**/*', _block_heavy_resources)
+            page = await context.new_page()
+            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+            
+            # Same as Selenium: wait for the price element, not the network
+            try:
+                await page.wait_for_selector(css_selector or _PRICE_ELEMENT_SELECTOR,
+                                             state='attached', timeout=10000)
+            except PlaywrightTimeoutError:
+                _log("  Price element did not appear, parsing page as-is")
+            
+            html = await page.content()
+        finally:
+            await context.close()
         
         return extract_price(html, css_selector)
     except ImportError:
-        print("❌ Selenium not installed. Install with: pip install selenium")
+        _log(f"❌ Playwright not installed. Install with: {_PLAYWRIGHT_INSTALL}")
         return None
     except Exception as e:
-        print(f"❌ Selenium error: {e}")
+        _log(f"❌ Playwright error: {e}")
         return None
 
-def fetch_price(url, css_selector=None, force_selenium=False):
+async def _fetch_prices_playwright(jobs, concurrency, logs):
+    from playwright.async_api import async_playwright
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async with async_playwright() as p:
+        browser = await p.chromium.launch()
+        
+        async def check(key, url, css_selector):
+            # Each gather() task has its own context, so this stays per job
+            if logs is not None:
+                _JOB_LOG.set(logs[key])
+            price = _get_cached_price(url, css_selector)
+            if price is None:
+                async with semaphore:
+                    price = await fetch_price_playwright(url, css_selector, browser)
+                _cache_price(url, css_selector, price)
+            return key, price
+        
+        try:
+            return await asyncio.gather(*(check(*job) for job in jobs))
+        finally:
+            await browser.close()
+
+def fetch_prices_playwright(jobs, logs=None):
+    """
+    Render many pages concurrently in one shared Playwright browser
+    
+    Args:
+        jobs: List of (key, url, css_selector) tuples
+        logs: Optional dict of key -> list collecting that job's messages
+    
+    Returns:
+        list: (key, price) pairs, price is None when it couldn't be found
+    """
+    try:
+        with _PLAYWRIGHT_BROWSERS:
+            return asyncio.run(_fetch_prices_playwright(jobs, Config.SELENIUM_WORKERS, logs))
+    except ImportError:
+        _log(f"❌ Playwright not installed. Install with: {_PLAYWRIGHT_INSTALL}")
+    except Exception as e:
+        _log(f"❌ Playwright error: {e}")
+    return [(key, None) for key, _, _ in jobs]
+
+def fetch_price(url, css_selector=None, force_selenium=False, selenium_pool=None, force_refresh=False,
+                validators=None):
     """
     Main function to fetch price with automatic fallback
     
+    Prices found in the last Config.PRICE_CACHE_TTL seconds are served from
+    an in-process cache, e.g. the first check right after adding a product.
+    
     Args:
         url: Product URL
         css_selector: Optional CSS selector
         force_selenium: If True, skip requests and go straight to Selenium
+        selenium_pool: Optional SeleniumPool to borrow a browser from
+        force_refresh: If True, ignore the cache and fetch the page again
+        validators: Optional conditional-GET state, see fetch_price_simple
     
     Returns:
         float: Price or None
     """
-    # If force_selenium flag is set, use Selenium directly
+    if not force_refresh:
+        price = _get_cached_price(url, css_selector)
+        if price is not None:
+            return price
+    
+    price = _fetch_price_uncached(url, css_selector, force_selenium, selenium_pool, validators)
+    _cache_price(url, css_selector, price)
+    return price
+
+def _get_cached_price(url, css_selector):
+    with _PRICE_CACHE_LOCK:
+        price = _PRICE_CACHE.get((url, css_selector))
+    if price is not None:
+        _log(f"✓ Price from cache: R{price}")
+    return price
+
+def _cache_price(url, css_selector, price):
+    if price:
+        with _PRICE_CACHE_LOCK:
+            _PRICE_CACHE[(url, css_selector)] = price
+
+def _fetch_price_uncached(url, css_selector, force_selenium, selenium_pool, validators=None):
+    """Fetch a price from the network, trying requests before Selenium"""
+    # If force_selenium flag is set, render the page directly
     if force_selenium:
-        print("🌐 Using Selenium (JavaScript rendering enabled)...")
-        return fetch_price_selenium(url, css_selector)
+        _log(f"🌐 Using {JS_RENDERER} (JavaScript rendering enabled)...")
+        return _fetch_price_js(url, css_selector, selenium_pool)
     
     # Try simple requests first (faster)
-    print("🔍 Trying simple fetch...")
-    price = fetch_price_simple(url, css_selector)
+    _log("🔍 Trying simple fetch...")
+    price = fetch_price_simple(url, css_selector, validators)
     
     if price:
-        print(f"✓ Price found: R{price}")
+        _log(f"✓ Price found: R{price}")
         return price
     
-    # If simple fetch fails, try Selenium (for React/SPA apps)
-    print("🌐 Simple fetch failed. Trying Selenium (JavaScript rendering)...")
-    price = fetch_price_selenium(url, css_selector)
+    # If simple fetch fails, try a browser (for React/SPA apps)
+    _log(f"🌐 Simple fetch failed. Trying {JS_RENDERER} (JavaScript rendering)...")
+    price = _fetch_price_js(url, css_selector, selenium_pool)
     
     if price:
-        print(f"✓ Price found with Selenium: R{price}")
+        _log(f"✓ Price found with {JS_RENDERER}: R{price}")
         return price
     
-    print("❌ Could not detect price")
-    return None
\ No newline at end of file
+    _log("❌ Could not detect price")
+    return None
+
+def _fetch_price_js(url, css_selector, selenium_pool):
+    """Render the page with the configured browser backend"""
+    if JS_RENDERER == 'playwright':
+        with _PLAYWRIGHT_BROWSERS:
+            return asyncio.run(fetch_price_playwright(url, css_selector))
+    return fetch_price_selenium(url, css_selector, selenium_pool)
+
+def build_check_jobs(products):
+    """
+    Turn product rows into fetch_prices() jobs
+    
+    Args:
+        products: Rows from get_products_for_check()
+    
+    Returns:
+        tuple: (jobs, details) where details maps product id to
+        (name, url, email, old_price, validators). The validators dicts are
+        shared with the jobs, so they hold the new ETag/Last-Modified once
+        that product's fetch completes.
+    """
+    jobs = []
+    details = {}
+    for product in products:
+        validators = {'etag': product['etag'], 'last_modified': product['last_modified'],
+                      'price': product['current_price']}
+        jobs.append((product['id'], product['url'], product['css_selector'],
+                     bool(product['use_selenium']), validators))
+        details[product['id']] = (product['name'], product['url'], product['email'],
+                                  product['current_price'], validators)
+    return jobs, details
+
+_BATCH = object()  # marks the future of a multi-product Playwright batch
+
+def fetch_prices(jobs):
+    """
+    Fetch prices for many products concurrently
+    
+    Price checks are network-bound, so the fetches overlap in a thread pool.
+    Selenium products run on a separate, smaller pool to cap Chrome memory,
+    and every Selenium fetch in the batch shares the same Chrome instances.
+    With JS_RENDERER=playwright they are rendered together in a
+    single Playwright browser instead.
+    
+    Args:
+        jobs: Iterable of (key, url, css_selector, use_selenium, validators)
+            tuples, validators as in fetch_price_simple (or None)
+    
+    Yields:
+        (key, future, log) as each fetch completes. Call future.result()
+        to get the price (or None); it re-raises any fetch error. log is the
+        list of messages that fetch produced, to print alongside the result.
+    """
+    jobs = list(jobs)
+    logs = {job[0]: [] for job in jobs}
+    
+    with SeleniumPool(Config.SELENIUM_WORKERS) as drivers, \
+         ThreadPoolExecutor(max_workers=Config.MAX_WORKERS) as simple_pool, \
+         ThreadPoolExecutor(max_workers=Config.SELENIUM_WORKERS) as selenium_pool:
+        futures = {}
+        playwright_jobs = []
+        for key, url, css_selector, use_selenium, validators in jobs:
+            if use_selenium and JS_RENDERER == 'playwright':
+                playwright_jobs.append((key, url, css_selector))
+                continue
+            pool = selenium_pool if use_selenium else simple_pool
+            future = pool.submit(_run_logged, logs[key], fetch_price, url, css_selector,
+                                 force_selenium=use_selenium, selenium_pool=drivers,
+                                 validators=validators)
+            futures[future] = key
+        
+        # Playwright renders all its pages in one browser on one event loop
+        if playwright_jobs:
+            futures[selenium_pool.submit(fetch_prices_playwright, playwright_jobs, logs)] = _BATCH
+        
+        for future in as_completed(futures):
+            key = futures[future]
+            if key is not _BATCH:
+                yield key, future, logs[key]
+                continue
+            for key, price in future.result():
+                done = Future()
+                done.set_result(price)
+                yield key, done, logs[key]